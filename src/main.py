@@ -1,6 +1,16 @@
-from flask import Flask, send_from_directory
+import os
+import sys
+
+# The matching pipeline lives at the repo root, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 
+import vector_skill_matrix
+
+vector_skill_matrix.build_index()
+
 app = Flask(__name__, static_folder="dist", static_url_path="")
 CORS(app)
 
@@ -8,5 +18,12 @@ CORS(app)
 def home():
     return send_from_directory(app.static_folder, "index.html")
 
+@app.route("/query")
+def query():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "missing query parameter 'q'"}), 400
+    return jsonify(vector_skill_matrix.answer_query(q))
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
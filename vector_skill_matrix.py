@@ -1,282 +1,649 @@
-import json
+import os
+
+# Size the BLAS/onnxruntime thread pools to the machine before the
+# compute libraries initialize; they read these on first import.
+os.environ.setdefault("OMP_NUM_THREADS", str(os.cpu_count() or 4))
+os.environ.setdefault("MKL_NUM_THREADS", str(os.cpu_count() or 4))
+
+import torch
+
+torch.set_num_threads(os.cpu_count() or 4)
+torch.set_num_interop_threads(1)
+
 import glob
+import hashlib
+import multiprocessing
+import queue
 import re
-from datetime import datetime
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+import orjson
+from numba import njit
+import onnxruntime
+from transformers import AutoTokenizer
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig, OptimizationConfig
+import hnswlib
+
+# Anchor data paths to the module so the index builds identically whether
+# the script runs from the repo root or via the Flask app in src/.
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_PATH = os.path.join(_BASE_DIR, "all-MiniLM-L6-v2")
+# FP16 only applies on the CUDA path; the CPU path keeps int8
+USE_FP16 = os.environ.get("USE_FP16", "1") == "1"
+PROFICIENCY_RANK = {"EXPERT": 0, "ADVANCED": 1, "INTERMEDIATE": 2, "BEGINNER": 3}
+# Compiled once; these run on every query and every indexed name
+_QUERY_RE = re.compile(r"who knows (.+?)(\?|$)")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_CONNECTIVE_RE = re.compile(r" and | or ")
+
+# 🔧 Step 0: Helper functions
+@lru_cache(maxsize=4096)
 def normalize(text):
     if not text:
         return ""
-    return text.strip().lower().replace("-", "").replace("_", "")
+    return text.strip().lower().replace("-", " ").replace("_", " ")
+
+def build_detailed_employee_text(emp):
+    text_parts = [
+        f"Employee Name: {emp.get('name', '')} (ID: {emp.get('empID', '')})",
+        f"Email: {emp.get('mailID', '')}",
+        f"Company: {emp.get('company', '')}",
+        f"Job Level: {emp.get('jobLevel', '')}",
+        "\nSkills:"
+    ]
 
-def find_skill_matches(skill_phrase, structured_data, partial=False):
-    skill_phrase_norm = normalize(skill_phrase)
-    skill_parts = [normalize(part) for part in skill_phrase.split('|')]
-    matches = []
-    for profile in structured_data:
-        for s in profile["skills_struct"]:
-            name = normalize(s["name"])
-            if skill_phrase_norm == name:
-                matches.append({"profile": profile, "skill": s})
-                break
-            elif partial and any(part in name for part in skill_parts):
-                matches.append({"profile": profile, "skill": s})
-                break
-    return matches
+    for skill in emp.get("skills", []):
+        path = skill.get("skill", {}).get("path")
+        if not path:
+            continue
+        text_parts.append(
+            f"- Skill: {path} | "
+            f"Proficiency: {skill.get('proficiency', 'UNKNOWN')} | "
+            f"Primary: {skill.get('isPrimary', '')} | Current: {skill.get('isCurrent', '')} | "
+            f"Experience: {skill.get('experienceProjectMths', 0)} months"
+        )
+
+    text_parts.append("\nCourses Completed:")
+    for course in emp.get("courses", []):
+        course_name = course.get("course", {}).get("courseName")
+        if course_name:
+            text_parts.append(
+                f"- {course_name} (Completed on {course.get('completedOn', '')})"
+            )
+
+    text_parts.append("\nCertifications:")
+    for cert in emp.get("certifications", []):
+        cert_name = cert.get("certification", {}).get("certificationName")
+        if cert_name:
+            text_parts.append(
+                f"- {cert_name} (Certified on {cert.get('certifiedOn', '')})"
+            )
+
+    return "\n".join(text_parts)
+
+class OnnxEncoder:
+    """MiniLM exported to ONNX with dynamic int8 quantization.
+
+    Keeps the old SentenceTransformer .encode() call sites working while
+    the forward pass runs through onnxruntime's int8 (VNNI) kernels.
+    """
+
+    def __init__(self, model_path, onnx_dir=None, device=None):
+        if onnx_dir is None:
+            onnx_dir = os.path.join(_BASE_DIR, "onnx-minilm")
+        if device is None:
+            # A CUDA-capable torch alone is not enough: the installed
+            # onnxruntime must also ship the CUDA provider, otherwise
+            # optimum raises at load. Fall back to the int8 CPU path.
+            device = (
+                "cuda"
+                if torch.cuda.is_available()
+                and "CUDAExecutionProvider" in onnxruntime.get_available_providers()
+                else "cpu"
+            )
+        self.device = device
+        if not os.path.exists(os.path.join(onnx_dir, "model_quantized.onnx")):
+            exported = ORTModelForFeatureExtraction.from_pretrained(model_path, export=True)
+            exported.save_pretrained(onnx_dir)
+            quantizer = ORTQuantizer.from_pretrained(onnx_dir)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False)
+            quantizer.quantize(save_dir=onnx_dir, quantization_config=qconfig)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        if device == "cuda":
+            # The int8 weights target CPU VNNI; on GPU run the exported
+            # graph, converted to FP16 for tensor-core matmuls.
+            file_name = "model.onnx"
+            if USE_FP16:
+                if not os.path.exists(os.path.join(onnx_dir, "model_optimized.onnx")):
+                    optimizer = ORTOptimizer.from_pretrained(onnx_dir)
+                    opt_config = OptimizationConfig(optimization_level=2, fp16=True)
+                    optimizer.optimize(save_dir=onnx_dir, optimization_config=opt_config)
+                file_name = "model_optimized.onnx"
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                onnx_dir, file_name=file_name, provider="CUDAExecutionProvider"
+            )
+        else:
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                onnx_dir, file_name="model_quantized.onnx"
+            )
+
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        # Smart batching: encode in ascending length order so each batch
+        # only pads to its own longest sequence, then restore input order.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        pooled_batches = []
+        for start in range(0, len(sorted_texts), batch_size):
+            batch = self.tokenizer(
+                sorted_texts[start:start + batch_size],
+                padding=True, truncation=True, max_length=128,
+                return_tensors="np",
+            )
+            hidden = self.model(**batch).last_hidden_state
+            mask = batch["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled_batches.append(pooled)
+        emb = np.concatenate(pooled_batches, axis=0)
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+        emb = emb[np.argsort(order)]
+        return emb[0] if single else emb
+
+# Slotted records: attribute access is a C-level slot fetch instead of a
+# dict hash probe, and each record is ~2x smaller than its dict form.
+@dataclass(slots=True)
+class Skill:
+    name: str
+    name_norm: str
+    proficiency: str
+    is_primary: bool
+    is_current: bool
+    exp_mths: int
+
+@dataclass(slots=True)
+class Course:
+    name: str
+    name_norm: str
+    completed_on: str
+
+@dataclass(slots=True)
+class Profile:
+    empID: str
+    name: str
+    mailID: str
+    jobLevel: str
+    skills_struct: list
+    courses_struct: list
+    # Parallel per-skill feature arrays for the jitted rank key
+    skill_exp: np.ndarray
+    skill_cur: np.ndarray
+    skill_prim: np.ndarray
+    skill_prof: np.ndarray
+
+def build_profile(entry):
+    """One raw employee entry -> (doc, structured profile)."""
+    emp = entry.get("employee", {})
 
-def find_and_matches(skill_parts, structured_data):
-    matches = []
-    for profile in structured_data:
-        for s in profile["skills_struct"]:
-            name = normalize(s["name"])
-            if all(part in name for part in skill_parts):
-                matches.append({"profile": profile, "skill": s})
-                break
-    return matches
+    skills_struct = [
+        Skill(
+            name=skill["skill"]["path"].split("|")[-1].strip(),
+            name_norm=normalize(skill["skill"]["path"].split("|")[-1].strip()),
+            proficiency=skill.get("proficiency", "UNKNOWN"),
+            is_primary=skill.get("isPrimary") == "YES",
+            is_current=skill.get("isCurrent") == "YES",
+            exp_mths=int(skill.get("experienceProjectMths") or 0),
+        )
+        for skill in emp.get("skills", [])
+        if skill.get("skill", {}).get("path")
+    ]
 
-def find_or_matches(skill_parts, structured_data):
-    matches = []
-    for profile in structured_data:
-        for s in profile["skills_struct"]:
-            name = normalize(s["name"])
-            if any(part in name for part in skill_parts):
-                matches.append({"profile": profile, "skill": s})
-                break
-    return matches
+    courses_struct = [
+        Course(
+            name=course["course"]["courseName"],
+            name_norm=normalize(course["course"]["courseName"]),
+            completed_on=course.get("completedOn", ""),
+        )
+        for course in emp.get("courses", [])
+        if course.get("course", {}).get("courseName")
+    ]
+
+    n_skills = len(skills_struct)
+    structured = Profile(
+        empID=emp.get("empID", ""),
+        name=emp.get("name", ""),
+        mailID=emp.get("mailID", ""),
+        jobLevel=emp.get("jobLevel", ""),
+        skills_struct=skills_struct,
+        courses_struct=courses_struct,
+        skill_exp=np.fromiter(
+            (s.exp_mths for s in skills_struct), dtype=np.int32, count=n_skills
+        ),
+        skill_cur=np.fromiter(
+            (s.is_current for s in skills_struct), dtype=np.uint8, count=n_skills
+        ),
+        skill_prim=np.fromiter(
+            (s.is_primary for s in skills_struct), dtype=np.uint8, count=n_skills
+        ),
+        skill_prof=np.fromiter(
+            (PROFICIENCY_RANK.get(s.proficiency, len(PROFICIENCY_RANK))
+             for s in skills_struct),
+            dtype=np.uint8, count=n_skills,
+        ),
+    )
 
-def find_course_matches(skill_phrase, structured_data):
-    skill_phrase_norm = normalize(skill_phrase)
+    return build_detailed_employee_text(emp), structured
+
+def build_profiles_from_file(path):
+    """Parse one data file and structure every entry in it."""
+    with open(path, "rb") as f:
+        return [build_profile(entry) for entry in orjson.loads(f.read()).get("data", ())]
+
+# Module-level singletons shared by every query; populated by build_index()
+docs = []
+structured_data = []
+exact_index = {}          # normalized skill name -> [profile_idx]
+token_index = {}          # skill name token -> set(profile_idx)
+course_token_index = {}   # course name token -> set(profile_idx)
+token_ids = {}            # skill name token -> bit position in skills_bits
+skills_bits = None        # uint64 bitset rows, one per profile
+skill_keys = None         # packed rank key per (profile, skill), padded with int64 min
+exp_mat = None            # padded per-(profile, skill) feature matrices
+cur_mat = None
+prim_mat = None
+prof_mat = None
+model = None
+hnsw_index = None
+
+# Micro-batching for query encodes: concurrent requests coalesce into a
+# single forward pass instead of N batch-of-1 transformer calls.
+MAX_BATCH = 32
+MAX_WAIT_MS = 10
+_encode_queue = queue.Queue()
+
+def _encode_worker():
+    while True:
+        batch = [_encode_queue.get()]
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000
+        while len(batch) < MAX_BATCH:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_encode_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        try:
+            embs = model.encode([text for text, _ in batch], batch_size=MAX_BATCH)
+        except Exception as exc:
+            # Propagate to every waiter in the batch; a raise here would
+            # kill the worker thread and leave all later callers hanging.
+            for _, future in batch:
+                future.set_exception(exc)
+            continue
+        for (_, future), emb in zip(batch, embs):
+            future.set_result(emb)
+
+def encode_query(text):
+    """Encode one query through the micro-batching worker."""
+    future = Future()
+    _encode_queue.put((text, future))
+    return future.result()
+
+def build_index():
+    """Load data, build the inverted indexes, and warm the vector store.
+
+    Called once by each entrypoint after import (never at import: the
+    process pool's feeder thread pickles under the import lock and
+    deadlocks) so the encoder load and HNSW build are amortized over
+    every query instead of paid per invocation.
+    """
+    global model, hnsw_index
+
+    # 📂 Step 1: Parse and structure the data files in parallel across
+    # cores; encoding stays single-process since ORT threads internally.
+    files = sorted(glob.glob(os.path.join(_BASE_DIR, "datasets", "*.json")))
+    # Fork explicitly: spawn workers would re-import torch and the ONNX
+    # stack in every worker just to parse JSON.
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("fork")) as ex:
+        for profiles in ex.map(build_profiles_from_file, files, chunksize=4):
+            for doc, structured in profiles:
+                docs.append(doc)
+                structured_data.append(structured)
+
+    # 🗂️ Step 1b: Build inverted indexes so queries intersect small posting
+    # sets instead of re-scanning every profile's skills per predicate.
+    for idx, profile in enumerate(structured_data):
+        for s in profile.skills_struct:
+            name = s.name_norm
+            exact_index.setdefault(name, []).append(idx)
+            for token in _TOKEN_RE.findall(name):
+                token_index.setdefault(token, set()).add(idx)
+        for c in profile.courses_struct:
+            for token in _TOKEN_RE.findall(c.name_norm):
+                course_token_index.setdefault(token, set()).add(idx)
+
+    # Bit-pack the token postings: row p holds one bit per token id, so
+    # AND/OR predicates reduce 64 profiles per uint64 word.
+    global skills_bits
+    for token in token_index:
+        token_ids[token] = len(token_ids)
+    n_words = (len(token_ids) + 63) // 64 or 1
+    skills_bits = np.zeros((len(structured_data), n_words), dtype=np.uint64)
+    for token, tid in token_ids.items():
+        for idx in token_index[token]:
+            skills_bits[idx, tid >> 6] |= np.uint64(1 << (tid & 63))
+
+    # Padded per-(profile, skill) matrices: the packed rank keys plus the
+    # feature columns, so best-skill selection and match-row packing are
+    # single fancy-indexed numpy ops instead of per-profile Python work.
+    global skill_keys, exp_mat, cur_mat, prim_mat, prof_mat
+    n_profiles = len(structured_data)
+    max_skills = max((len(p.skills_struct) for p in structured_data), default=0) or 1
+    skill_keys = np.full((n_profiles, max_skills), np.iinfo(np.int64).min, dtype=np.int64)
+    exp_mat = np.zeros((n_profiles, max_skills), dtype=np.int32)
+    cur_mat = np.zeros((n_profiles, max_skills), dtype=np.uint8)
+    prim_mat = np.zeros((n_profiles, max_skills), dtype=np.uint8)
+    prof_mat = np.zeros((n_profiles, max_skills), dtype=np.uint8)
+    for idx, profile in enumerate(structured_data):
+        k = len(profile.skills_struct)
+        if not k:
+            continue
+        skill_keys[idx, :k] = _packed_rank(
+            profile.skill_exp, profile.skill_cur,
+            profile.skill_prim, profile.skill_prof,
+        )
+        exp_mat[idx, :k] = profile.skill_exp
+        cur_mat[idx, :k] = profile.skill_cur
+        prim_mat[idx, :k] = profile.skill_prim
+        prof_mat[idx, :k] = profile.skill_prof
+
+    # 🧠 Step 2: Vectorize
+    model = OnnxEncoder(MODEL_PATH)
+
+    # Skip re-encoding when neither the documents nor the model changed
+    cache_key = hashlib.sha256(
+        ("\n".join(docs) + os.path.basename(MODEL_PATH)).encode("utf-8")
+    ).hexdigest()
+    cache_dir = os.path.join(_BASE_DIR, "cache")
+    cache_path = os.path.join(cache_dir, f"{cache_key}.npz")
+    if os.path.exists(cache_path):
+        print("♻️ Reusing cached embeddings...")
+        embeddings = np.load(cache_path)["emb"]
+    else:
+        print("🔄 Encoding employee profiles into vector embeddings...")
+        batch_size = 256 if model.device == "cuda" else 64
+        embeddings = model.encode(docs, batch_size=batch_size).astype(np.float32)
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, emb=embeddings)
+
+    # 🧠 Step 3: In-process HNSW for the semantic fallback; no SQLite or
+    # client layer between the query embedding and the graph walk.
+    hnsw_index = hnswlib.Index(space="cosine", dim=embeddings.shape[1])
+    hnsw_index.init_index(max_elements=len(docs), M=16, ef_construction=200)
+    hnsw_index.add_items(embeddings, np.arange(len(docs)))
+    hnsw_index.set_ef(100)
+
+    threading.Thread(target=_encode_worker, daemon=True, name="query-encoder").start()
+
+def find_skill_matches(phrase):
+    """Profiles whose skill name equals the phrase exactly (normalized)."""
+    return np.fromiter(exact_index.get(normalize(phrase), ()), dtype=np.int32)
+
+def _part_mask(part):
+    """Profiles whose skill names contain every token of one query part."""
+    n = len(structured_data)
+    tokens = _TOKEN_RE.findall(normalize(part))
+    if not tokens:
+        return np.zeros(n, dtype=bool)
+    mask = np.ones(n, dtype=bool)
+    for token in tokens:
+        tid = token_ids.get(token)
+        if tid is None:
+            return np.zeros(n, dtype=bool)
+        mask &= ((skills_bits[:, tid >> 6] >> np.uint64(tid & 63)) & np.uint64(1)).astype(bool)
+    return mask
+
+def _token_mask(parts, all_required):
+    """Combine per-part masks with AND (all_required) or OR."""
+    n = len(structured_data)
+    mask = np.ones(n, dtype=bool) if all_required else np.zeros(n, dtype=bool)
+    for p in parts:
+        if all_required:
+            mask &= _part_mask(p)
+        else:
+            mask |= _part_mask(p)
+    return mask
+
+def find_and_matches(parts):
+    """Profiles that have every token in parts among their skill names."""
+    if not parts:
+        return np.empty(0, dtype=np.int32)
+    return np.nonzero(_token_mask(parts, all_required=True))[0].astype(np.int32)
+
+def find_or_matches(parts):
+    """Profiles that have at least one of the tokens among their skill names."""
+    return np.nonzero(_token_mask(parts, all_required=False))[0].astype(np.int32)
+
+def find_partial_matches(parts):
+    """Profiles whose skill name contains any part as a substring.
+
+    This pass scans every profile: a token-postings prefilter is unsound
+    for substrings (a part may only occur inside a longer token).
+    """
+    escaped = [re.escape(p) for p in map(normalize, parts) if p]
+    if not escaped:
+        return np.empty(0, dtype=np.int32)
+    pattern = re.compile("|".join(escaped))
     matches = []
-    for profile in structured_data:
-        for c in profile["courses_struct"]:
-            course_name = normalize(c["name"])
-            if skill_phrase_norm in course_name or any(part in course_name for part in skill_phrase_norm.split("|")):
-                matches.append({"profile": profile, "course": c})
+    for idx, profile in enumerate(structured_data):
+        for s in profile.skills_struct:
+            if pattern.search(s.name_norm):
+                matches.append(idx)
                 break
-    return matches
-
-def skill_sort_key(match):
-    proficiency_order = {"EXPERT": 4, "PROFICIENT": 3, "COMPETENT": 2, "BEGINNER": 1, None: 0}
-    s = match["skill"]
-    return (
-        -(s.get("experienceProjectMths", 0) or 0),
-        -1 if (s.get("isCurrent", "").upper() == "YES") else 0,
-        1 if (s.get("isPrimary", "").upper() == "YES") else 0,
-        -proficiency_order.get((s.get("proficiency") or "").upper(), 0)
-    )
+    return np.fromiter(matches, dtype=np.int32)
 
-def clean_skills(skills_struct):
+def find_course_matches(parts):
+    """Profiles that completed a course mentioning any token of any part."""
+    matched = set()
+    for p in parts:
+        for token in _TOKEN_RE.findall(normalize(p)):
+            matched |= course_token_index.get(token, set())
+    return np.fromiter(matched, dtype=np.int32)
+
+@lru_cache(maxsize=1024)
+def extract_skill_phrase(query):
+    match = _QUERY_RE.search(query.lower())
+    return match.group(1).strip() if match else query.strip()
+
+@njit(cache=True)
+def _packed_rank(exp, cur, prim, prof):
+    """Pack (exp_mths, is_current, is_primary, proficiency) into one int64 key.
+
+    Higher is better, so the best skill is a single argmax instead of a
+    Python tuple sort. Non-primary skills rank above primary ones, matching
+    the original skill_sort_key ordering.
+    """
+    keys = np.empty(exp.shape[0], dtype=np.int64)
+    for i in range(exp.shape[0]):
+        keys[i] = (
+            (np.int64(exp[i]) << 16)
+            | (np.int64(cur[i]) << 9)
+            | ((1 - np.int64(prim[i])) << 8)
+            | np.int64(7 - prof[i])
+        )
+    return keys
+
+def clean_skills(profile):
+    """Deduplicated, display-ready skill names for a profile."""
     seen = set()
     cleaned = []
-    for s in skills_struct:
-        name = normalize(s["name"])
-        if name and name not in seen:
+    for s in profile.skills_struct:
+        name = s.name_norm
+        if name not in seen:
             seen.add(name)
-            cleaned.append(s)
+            cleaned.append(s.name)
     return cleaned
 
-# Load Data
-all_data = []
-for file in glob.glob("datasets/*.json"):
-    with open(file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        if "data" in data:
-            all_data.extend(data["data"])
-
-raw_data = all_data
-
-# Prepare data for embedding
-model = SentenceTransformer('./all-MiniLM-L6-v2')
-docs, ids, metadatas, structured_data = [], [], [], []
-
-for entry in raw_data:
-    emp = entry["employee"]
-    emp_id = emp.get("empID", "")
-    name = emp.get("name", "")
-    job_level = emp.get("jobLevel", "")
-    company = emp.get("company", "")
-    mailID = emp.get("mailID", "")
-
-    skills_struct = [
-        {
-            "name": s.get("skill", {}).get("path", ""),
-            "proficiency": s.get("proficiency", ""),
-            "isPrimary": s.get("isPrimary", ""),
-            "isCurrent": s.get("isCurrent", ""),
-            "experienceProjectMths": s.get("experienceProjectMths", 0) or 0
+def best_skill_idx(profile_idx, phrase=None):
+    """Index of the strongest skill on a profile, optionally phrase-restricted."""
+    if phrase is not None:
+        profile = structured_data[profile_idx]
+        phrase_norm = normalize(phrase)
+        restricted = [
+            i for i, s in enumerate(profile.skills_struct)
+            if phrase_norm in s.name_norm
+        ]
+        if restricted:
+            restricted = np.asarray(restricted)
+            return int(restricted[np.argmax(skill_keys[profile_idx, restricted])])
+    return int(np.argmax(skill_keys[profile_idx]))
+
+# One row per candidate match; SoA layout so dedup and ranking run in numpy
+MATCH_DTYPE = np.dtype([
+    ("profile_idx", np.int32),
+    ("skill_idx", np.int16),
+    ("match_type", np.int8),
+    ("exp_mths", np.int32),
+    ("is_current", np.uint8),
+    ("is_primary", np.uint8),
+    ("prof_rank", np.uint8),
+])
+MATCH_TYPES = ("exact", "and", "or", "partial", "course", "semantic")
+
+def _match_rows(indices, match_code, phrase=None):
+    rows = np.empty(len(indices), dtype=MATCH_DTYPE)
+    if not len(indices):
+        return rows
+    if phrase is None:
+        # Best skill per profile is one argmax over the packed-key matrix
+        si = np.argmax(skill_keys[indices], axis=1)
+    else:
+        si = np.fromiter(
+            (best_skill_idx(int(i), phrase) for i in indices),
+            dtype=np.int64, count=len(indices),
+        )
+    rows["profile_idx"] = indices
+    rows["skill_idx"] = si
+    rows["match_type"] = match_code
+    rows["exp_mths"] = exp_mat[indices, si]
+    rows["is_current"] = cur_mat[indices, si]
+    rows["is_primary"] = prim_mat[indices, si]
+    rows["prof_rank"] = prof_mat[indices, si]
+    return rows
+
+def _matched_course_idx(profile_idx, parts):
+    """First course on the profile mentioning any token of any part."""
+    tokens = {t for p in parts for t in _TOKEN_RE.findall(normalize(p))}
+    for ci, c in enumerate(structured_data[profile_idx].courses_struct):
+        if tokens.intersection(_TOKEN_RE.findall(c.name_norm)):
+            return ci
+    return 0
+
+def _course_rows(indices, parts):
+    """Course-pass rows: ranked by the profile's best-skill features (zeros
+    for skill-less profiles) but carrying the matched course index."""
+    rows = _match_rows(indices, 4)
+    for n, i in enumerate(indices):
+        rows["skill_idx"][n] = _matched_course_idx(int(i), parts)
+    return rows
+
+@lru_cache(maxsize=1024)
+def answer_query(query):
+    """Run the five structured passes plus the semantic fallback.
+
+    Returns the top matches as JSON-serializable dicts.
+    """
+    phrase = extract_skill_phrase(query)
+
+    # One running mask replaces per-pass dedup: a profile claimed by an
+    # earlier (higher-priority) pass is dropped before feature packing.
+    seen = np.zeros(len(structured_data), dtype=bool)
+
+    def take(indices):
+        indices = np.unique(indices)
+        indices = indices[~seen[indices]]
+        seen[indices] = True
+        return indices
+
+    # The five structured passes, in priority order
+    pass_rows = [_match_rows(take(find_skill_matches(phrase)), 0, phrase)]
+    if " and " in phrase:
+        parts = [p.strip() for p in phrase.split(" and ")]
+        pass_rows.append(_match_rows(take(find_and_matches(parts)), 1))
+    parts = [p.strip() for p in _CONNECTIVE_RE.split(phrase)]
+    pass_rows.append(_match_rows(take(find_or_matches(parts)), 2))
+    pass_rows.append(_match_rows(take(find_partial_matches(parts)), 3, phrase))
+    pass_rows.append(_course_rows(take(find_course_matches(parts)), parts))
+
+    kept = np.concatenate(pass_rows)
+
+    # Rank: pass priority first, then the skill sort key columns
+    order = np.lexsort((
+        kept["prof_rank"],
+        kept["is_primary"],
+        1 - kept["is_current"],
+        -kept["exp_mths"],
+        kept["match_type"],
+    ))
+    ranked = kept[order]
+
+    # Semantic fallback when the structured passes come up short
+    if len(ranked) < 3:
+        query_embedding = encode_query(query)
+        labels, _ = hnsw_index.knn_query(query_embedding, k=min(3, len(structured_data)))
+        fallback_idx = labels[0].astype(np.int32)
+        fallback_idx = fallback_idx[~seen[fallback_idx]]
+        ranked = np.concatenate([ranked, _match_rows(fallback_idx, 5)])
+
+    out = []
+    for row in ranked[:3]:
+        profile = structured_data[row["profile_idx"]]
+        match_type = MATCH_TYPES[row["match_type"]]
+        entry = {
+            "empID": profile.empID,
+            "name": profile.name,
+            "mailID": profile.mailID,
+            "jobLevel": profile.jobLevel,
+            "match_type": match_type,
+            "skills": clean_skills(profile),
         }
-        for s in emp.get("skills", []) if s.get("skill", {}).get("path")
-    ]
-    skills_struct = clean_skills(skills_struct)
-    skills_list = [s["name"] for s in skills_struct]
-    skills = ", ".join(skills_list)
-
-    courses_struct = [
-        {
-            "name": c.get("course", {}).get("courseName", ""),
-            "completedOn": c.get("completedon", "")
-        }
-        for c in emp.get("courses", []) if c.get("course", {}).get("courseName")
-    ]
-    courses_list = [c["name"] for c in courses_struct]
-    courses = ", ".join(courses_list)
-
-    certs_struct = [
-        {
-            "name": cert.get("certification", {}).get("certificationName", ""),
-            "certifiedOn": cert.get("certifiedon", "")
-        }
-        for cert in emp.get("certifications", []) if cert.get("certification", {}).get("certificationName")
-    ]
-    certs_list = [c["name"] for c in certs_struct]
-    certifications = ", ".join(certs_list)
-
-    summary = f"{name} (ID: {emp_id}) is at Job Level {job_level} in {company}. Skills: {skills}. Courses: {courses}. Certifications: {certifications}."
-    docs.append(summary)
-    ids.append(emp_id)
-    metadatas.append({
-        "empID": emp_id,
-        "name": name,
-        "jobLevel": job_level,
-        "company": company,
-        "mailID": mailID,
-        "skills": skills,
-        "skills_list": ", ".join(skills_list),
-        "courses": courses,
-        "courses_list": ", ".join(courses_list),
-        "certifications": certifications,
-        "certs_list": ", ".join(certs_list)
-    })
-    structured_data.append({
-        "empID": emp_id,
-        "name": name,
-        "jobLevel": job_level,
-        "company": company,
-        "mailID": mailID,
-        "skills_struct": skills_struct,
-        "courses_struct": courses_struct,
-        "certs_struct": certs_struct,
-        "summary": summary
-    })
-
-print("Encoding summaries into vector embeddings...")
-embeddings = model.encode(docs, show_progress_bar=True, convert_to_tensor=True).tolist()
-
-print("Storing data into ChromaDB...")
-client = chromadb.Client(Settings(anonymized_telemetry=False))
-collection = client.get_or_create_collection(name="employee_profiles")
-existing = collection.get()
-existing_ids = existing['ids'] if 'ids' in existing else []
-if existing_ids:
-    collection.delete(ids=existing_ids)
-collection.add(documents=docs, embeddings=embeddings, ids=ids, metadatas=metadatas)
-print("Data stored successfully in ChromaDB.")
-
-query = input("\nEnter your query (e.g., who knows Big Data and NLP?):\n>")
-
-def extract_skill_phrase(query):
-    match = re.search(r"who knows (.+?)(\?|$)", query.lower())
-    if match:
-        return match.group(1).strip()
-    return None
-
-skill_phrase = extract_skill_phrase(query)
-if not skill_phrase:
-    print("Could not extract skill phrase from query.")
-    exit()
-
-skill_phrase = skill_phrase.replace(" and ", "|").replace(" or ", "|")
-skill_parts = [normalize(part) for part in skill_phrase.split("|")]
-
-print(f"Skill phrase for matching: {skill_phrase}")
-
-# Main Matching Logic
-top_matches = []
-
-exact_matches = find_skill_matches(skill_phrase, structured_data)
-for m in exact_matches:
-    m["match_type"] = "exact"
-top_matches.extend(exact_matches)
-
-if len(skill_parts) > 1:
-    and_matches = find_and_matches(skill_parts, structured_data)
-    for m in and_matches:
-        m["match_type"] = "and"
-    existing_ids = {m["profile"]["empID"] for m in top_matches}
-    and_matches = [m for m in and_matches if m["profile"]["empID"] not in existing_ids]
-    top_matches.extend(and_matches)
-
-if len(skill_parts) > 1:
-    or_matches = find_or_matches(skill_parts, structured_data)
-    for m in or_matches:
-        m["match_type"] = "or"
-    existing_ids = {m["profile"]["empID"] for m in top_matches}
-    or_matches = [m for m in or_matches if m["profile"]["empID"] not in existing_ids]
-    top_matches.extend(or_matches)
-
-related_matches = find_skill_matches(skill_phrase, structured_data, partial=True)
-for m in related_matches:
-    m["match_type"] = "partial"
-existing_ids = {m["profile"]["empID"] for m in top_matches}
-related_matches = [m for m in related_matches if m["profile"]["empID"] not in existing_ids]
-top_matches.extend(related_matches)
-
-course_matches = find_course_matches(skill_phrase, structured_data)
-for m in course_matches:
-    m["match_type"] = "course"
-existing_ids = {m["profile"]["empID"] for m in top_matches}
-course_matches = [m for m in course_matches if m["profile"]["empID"] not in existing_ids]
-top_matches.extend(course_matches)
-
-if len(top_matches) < 3:
-    print("\nNo direct or related skill/course match found. Showing semantic fallback:")
-    query_embedding = model.encode(query, convert_to_tensor=True).tolist()
-    results = collection.query(query_embeddings=[query_embedding], n_results=3)
-    existing_ids = {m["profile"]["empID"] for m in top_matches if "profile" in m}
-    for i, doc in enumerate(results['documents'][0]):
-        meta = results['metadatas'][0][i]
-        if meta.get('empID', '') in existing_ids:
-            continue
-        print(f"\nMatch {len(top_matches)+1} (Semantic Match):")
-        print(f"Name: {meta.get('name', '')} (ID: {meta.get('empID', '')}), Job Level: {meta.get('jobLevel', '')}, Company: {meta.get('company', '')}")
-        print(f"Email: {meta.get('mailID', '')}")
-        skills = meta.get('skills_list', '').split(', ')
-        print("Top skills:")
-        for skill in skills[:5]:
-            print(f"- {skill}")
-        if len(skills) > 5:
-            print(f"...and {len(skills)-5} more.")
-        if len(top_matches) + 1 >= 3:
-            break
-
-if top_matches:
-    exacts = [m for m in top_matches if m.get("match_type") == "exact"]
-    best_exact = sorted(exacts, key=skill_sort_key)[0] if exacts else None
-
-    best_and = None
-    if not best_exact:
-        ands = [m for m in top_matches if m.get("match_type") == "and"]
-        best_and = sorted(ands, key=skill_sort_key)[0] if ands else None
-
-    non_exacts = [m for m in top_matches if m.get("match_type") not in ("exact", "and")]
-    non_exacts_sorted = sorted(non_exacts, key=skill_sort_key)
-
-    final_matches = []
-    if best_exact:
-        final_matches.append(best_exact)
-    elif best_and:
-        final_matches.append(best_and)
-    final_matches.extend(non_exacts_sorted[:2])
-
-    print("\nTop 3 relevant employees:")
-    for m in final_matches:
-        profile = m["profile"]
-        print(f"\n{profile['name']} (ID: {profile['empID']}), Email: {profile['mailID']}")
-        if "skill" in m:
-            s = m["skill"]
-            print(f"Skill: {s['name']}, Experience: {s.get('experienceProjectMths', 0)} months, Proficiency: {s.get('proficiency', '')}, Current: {s.get('isCurrent', '')}, Primary: {s.get('isPrimary', '')}")
-        elif "course" in m:
-            c = m["course"]
-            print(f"Related course: {c['name']} (Completed On: {c.get('completedOn', '')})")
+        if match_type == "course":
+            course = profile.courses_struct[row["skill_idx"]]
+            entry["course"] = {"name": course.name, "completed_on": course.completed_on}
+        elif profile.skills_struct:
+            skill = profile.skills_struct[row["skill_idx"]]
+            entry["best_skill"] = {
+                "name": skill.name,
+                "proficiency": skill.proficiency,
+                "exp_mths": skill.exp_mths,
+            }
+        else:
+            entry["best_skill"] = None
+        out.append(entry)
+    return out
+
+# 🔍 Interactive query loop (CLI use; the Flask app calls answer_query directly)
+if __name__ == "__main__":
+    build_index()
+    while True:
+        query = input("\n🔍 Enter your query (e.g., Who knows PySpark and Azure?):\n> ")
+
+        print("\n📊 Top Matches:")
+        for rank, m in enumerate(answer_query(query)):
+            print(f"\n🔹 Match {rank + 1} ({m['match_type']}):")
+            print(f"   {m['name']} ({m['empID']}) | {m['mailID']}")
+            if m.get("course"):
+                course = m["course"]
+                print(f"   Related course: {course['name']} (Completed on {course['completed_on']})")
+            elif m.get("best_skill"):
+                skill = m["best_skill"]
+                print(f"   Best skill: {skill['name']} | {skill['proficiency']} | {skill['exp_mths']} months")
+            print(f"   All skills: {', '.join(m['skills'])}")